@@ -1,30 +1,84 @@
 #!/usr/bin/env python3
 import requests
 import argparse
-from datetime import datetime, timedelta
 import json
 import sys
 import os
 import csv
 import sqlite3
+import atexit
 import time
+import concurrent.futures
+from collections import defaultdict
+from itertools import islice
 from rich.console import Console
-from rich.table import Table
-from rich.progress import Progress
-from rich.panel import Panel
 from pathlib import Path
 
+# Seconds a cached dataset is served before revalidating it
+CACHE_TTL = 24 * 60 * 60
+
+# STIX object types read by the technique index; everything else is dropped while parsing
+INDEXED_TYPES = {'bundle', 'x-mitre-tactic', 'attack-pattern'}
+
+# Severity label for each possible score (0-6) computed by get_severity_level
+SEVERITY_BY_SCORE = ("BAIXO", "BAIXO", "MÉDIO", "ALTO", "CRÍTICO", "CRÍTICO", "CRÍTICO")
+
+# Rich style used for each severity label in the results table
+SEVERITY_STYLES = {
+    "CRÍTICO": "red bold",
+    "ALTO": "red",
+    "MÉDIO": "yellow",
+    "BAIXO": "green"
+}
+
+def drop_unindexed_objects(obj):
+    """json object_hook that discards STIX objects the index never reads"""
+    obj_type = obj.get('type')
+    if obj_type is None or obj_type in INDEXED_TYPES:
+        return obj
+    return None
+
+class Technique:
+    """Compact record holding only the technique fields the CLI reads"""
+    __slots__ = ('mitre_id', 'name', 'tactic', 'severity', 'platforms', 'detection', 'description',
+                 'name_lc', 'desc_lc', 'desc_short')
+
+    def __init__(self, mitre_id, name, tactic, severity, platforms, detection, description,
+                 name_lc, desc_lc):
+        self.mitre_id = mitre_id
+        self.name = name
+        self.tactic = tactic
+        self.severity = severity
+        self.platforms = platforms
+        self.detection = detection
+        self.description = description
+        self.name_lc = name_lc
+        self.desc_lc = desc_lc
+        # Table view shows only the first 100 characters of the description
+        self.desc_short = description[:100] + "..." if len(description) > 100 else description
+
 class AttackHunter:
     def __init__(self):
         # Atualizado para usar a versão atual da API do MITRE ATT&CK
         self.base_url = "https://raw.githubusercontent.com/mitre/cti/master"
         self.enterprise_url = f"{self.base_url}/enterprise-attack/enterprise-attack.json"
         self.console = Console()
+        self.session = requests.Session()
+        self.session.headers.update({'Accept-Encoding': 'gzip'})
         self.cache_dir = Path.home() / '.attackhunter'
         self.cache_db = self.cache_dir / 'cache.db'
+        self._index_source = None
+        self._tactic_id_to_name = {}
+        self._tactic_name_to_techs = {}
+        self._all_techs = []
         self.initialize_cache()
         
-    def show_banner(self):
+    def show_banner(self, quiet=False):
+        # Skip the banner (and the Panel layout cost) when piped or asked to be quiet
+        if quiet or not sys.stdout.isatty():
+            return
+        from rich.panel import Panel
+
         banner = """
    ______     _______ __  __             __           
   / ____/  __/ ____/ / / / /_  ______  / /____  _____
@@ -40,41 +94,75 @@ class AttackHunter:
     
     def initialize_cache(self):
         self.cache_dir.mkdir(exist_ok=True)
-        conn = sqlite3.connect(str(self.cache_db))
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS attack_cache
-                    (query TEXT PRIMARY KEY, data TEXT, timestamp TEXT)''')
-        conn.commit()
-        conn.close()
-
-    def get_from_cache(self, query_key):
-        conn = sqlite3.connect(str(self.cache_db))
-        c = conn.cursor()
-        c.execute("SELECT data, timestamp FROM attack_cache WHERE query = ?", (query_key,))
-        result = c.fetchone()
-        conn.close()
+        # One connection for the process lifetime, in autocommit mode
+        self.conn = sqlite3.connect(str(self.cache_db), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        atexit.register(self.conn.close)
+        # Cached bodies live in plain files next to the database; this table only
+        # tracks their validators and age
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS attack_meta
+                    (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, timestamp INTEGER)''')
+
+    def cache_path(self, url):
+        return self.cache_dir / url.rsplit('/', 1)[-1]
+
+    def get_from_cache(self, url):
+        """Return (etag, last_modified, is_fresh) for a cached URL"""
+        result = self.conn.execute("SELECT etag, last_modified, timestamp FROM attack_meta WHERE url = ?",
+                                   (url,)).fetchone()
         
-        if result:
-            data, timestamp = result
-            cache_time = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-            if datetime.now() - cache_time < timedelta(hours=24):
-                return json.loads(data)
+        if result and self.cache_path(url).exists():
+            etag, last_modified, timestamp = result
+            return etag, last_modified, time.time() - timestamp < CACHE_TTL
         return None
 
-    def save_to_cache(self, query_key, data):
-        conn = sqlite3.connect(str(self.cache_db))
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO attack_cache VALUES (?, ?, ?)",
-                 (query_key, json.dumps(data), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
+    def load_cached(self, url):
+        """Parse the cached body for a URL straight from its file"""
+        return json.loads(self.cache_path(url).read_bytes())
+
+    def save_to_cache(self, url, content, etag=None, last_modified=None):
+        # Write to a temporary file first so a crash never leaves a truncated body behind
+        path = self.cache_path(url)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        tmp_path.write_bytes(content)
+        tmp_path.replace(path)
+        self.conn.execute("INSERT OR REPLACE INTO attack_meta VALUES (?, ?, ?, ?)",
+                          (url, etag, last_modified, int(time.time())))
+
+    def touch_cache(self, url):
+        self.conn.execute("UPDATE attack_meta SET timestamp = ? WHERE url = ?",
+                          (int(time.time()), url))
 
     def fetch_attack_data(self):
         """Fetch the complete MITRE ATT&CK Enterprise dataset"""
+        # The raw dataset is cached once; keyword/severity filters run in memory
+        cached = self.get_from_cache(self.enterprise_url)
+        headers = {}
+        if cached:
+            etag, last_modified, is_fresh = cached
+            if is_fresh:
+                return self.load_cached(self.enterprise_url)
+            # Stale entry: revalidate so an unchanged dataset costs a 304, not a full download
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
         try:
-            response = requests.get(self.enterprise_url, timeout=30)
-            if response.status_code == 200:
-                return response.json()
+            response = self.session.get(self.enterprise_url, headers=headers, timeout=30)
+            if response.status_code == 304 and cached:
+                self.touch_cache(self.enterprise_url)
+                return self.load_cached(self.enterprise_url)
+            elif response.status_code == 200:
+                attack_data = self.parse_attack_data(response.content)
+                # Cache the pruned bundle so cache hits only parse tactics and techniques
+                content = json.dumps(attack_data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+                self.save_to_cache(self.enterprise_url, content,
+                                   response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                return attack_data
             else:
                 self.console.print(f"[red]Error fetching ATT&CK data: {response.status_code}[/red]")
                 return None
@@ -82,39 +170,66 @@ class AttackHunter:
             self.console.print(f"[red]Error: {str(e)}[/red]")
             return None
 
+    def parse_attack_data(self, content):
+        """Parse the ATT&CK bundle keeping only tactics and techniques"""
+        # Relationships and other objects make up most of the bundle; dropping them
+        # as they are decoded keeps them from piling up in memory until indexing
+        attack_data = json.loads(content, object_hook=drop_unindexed_objects)
+        attack_data['objects'] = [obj for obj in attack_data.get('objects', []) if obj is not None]
+        return attack_data
+
     def get_techniques(self, attack_data, tactic_id=None):
         """Extract techniques from the ATT&CK dataset"""
         if not attack_data:
             return []
 
-        techniques = []
-        tactic_name = None
+        if self._index_source is not attack_data:
+            self.build_index(attack_data)
 
-        # If tactic_id is provided, first find the tactic name
         if tactic_id:
-            for obj in attack_data['objects']:
-                if obj.get('type') == 'x-mitre-tactic' and obj.get('external_references'):
-                    for ref in obj['external_references']:
-                        if ref.get('external_id') == tactic_id:
-                            tactic_name = obj.get('name')
-                            break
-                    if tactic_name:
-                        break
-
-        # Extract techniques
+            tactic_name = self._tactic_id_to_name.get(tactic_id)
+            return list(self._tactic_name_to_techs.get(tactic_name, []))
+        return list(self._all_techs)
+
+    def build_index(self, attack_data):
+        """Index tactics and techniques in a single pass over the dataset"""
+        tactic_id_to_name = {}
+        tactic_name_to_techs = defaultdict(list)
+        all_techs = []
+
         for obj in attack_data['objects']:
-            if obj.get('type') == 'attack-pattern':
-                # If tactic_id is provided, only include techniques for that tactic
-                if tactic_id:
-                    if obj.get('kill_chain_phases'):
-                        for phase in obj['kill_chain_phases']:
-                            if phase.get('phase_name') == tactic_name:
-                                techniques.append(obj)
-                                break
-                else:
-                    techniques.append(obj)
-
-        return techniques
+            obj_type = obj.get('type')
+            if obj_type == 'x-mitre-tactic':
+                ext_id = next((ref.get('external_id') for ref in obj.get('external_references', [])
+                               if ref.get('source_name') == 'mitre-attack'), None)
+                if ext_id:
+                    # Techniques reference tactics by shortname in their kill chain phases
+                    tactic_id_to_name[ext_id] = obj.get('x_mitre_shortname', obj.get('name'))
+            elif obj_type == 'attack-pattern':
+                technique = self.make_technique(obj)
+                all_techs.append(technique)
+                for phase in obj.get('kill_chain_phases', []):
+                    tactic_name_to_techs[phase['phase_name']].append(technique)
+
+        self._tactic_id_to_name = tactic_id_to_name
+        self._tactic_name_to_techs = tactic_name_to_techs
+        self._all_techs = all_techs
+        self._index_source = attack_data
+
+    def make_technique(self, obj):
+        """Build a Technique record from a STIX attack-pattern object"""
+        return Technique(
+            mitre_id=next((ref.get('external_id') for ref in obj.get('external_references', [])
+                           if ref.get('source_name') == 'mitre-attack'), "N/A"),
+            name=obj.get('name', 'N/A'),
+            tactic=', '.join([phase['phase_name'] for phase in obj.get('kill_chain_phases', [])]),
+            severity=self.get_severity_level(obj),
+            platforms=', '.join(obj.get('x_mitre_platforms', [])),
+            detection=obj.get('x_mitre_detection', 'N/A'),
+            description=obj.get('description', 'No description available'),
+            name_lc=obj.get('name', '').lower(),
+            desc_lc=obj.get('description', '').lower()
+        )
 
     def get_severity_level(self, technique):
         """Determine severity based on technique characteristics"""
@@ -138,60 +253,44 @@ class AttackHunter:
             score += 1
             
         # Evaluate based on score
-        if score >= 4:
-            return "CRÍTICO"
-        elif score >= 3:
-            return "ALTO"
-        elif score >= 2:
-            return "MÉDIO"
-        return "BAIXO"
+        return SEVERITY_BY_SCORE[score]
 
     def prepare_technique_data(self, technique):
         """Prepare technique data for display"""
-        technique_id = "N/A"
-        for ref in technique.get('external_references', []):
-            if ref.get('source_name') == 'mitre-attack':
-                technique_id = ref.get('external_id')
-                break
-                
         return {
-            'Technique_ID': technique_id,
-            'Name': technique.get('name', 'N/A'),
-            'Tactic': ', '.join([phase['phase_name'] for phase in technique.get('kill_chain_phases', [])]),
-            'Severity': self.get_severity_level(technique),
-            'Platforms': ', '.join(technique.get('x_mitre_platforms', [])),
-            'Detection': technique.get('x_mitre_detection', 'N/A'),
-            'Description': technique.get('description', 'No description available')
+            'Technique_ID': technique.mitre_id,
+            'Name': technique.name,
+            'Tactic': technique.tactic,
+            'Severity': technique.severity,
+            'Platforms': technique.platforms,
+            'Detection': technique.detection,
+            'Description': technique.description
         }
 
+    def build_filter(self, keyword=None, min_severity=None):
+        """Build a single predicate for the keyword and severity filters"""
+        kw = keyword.lower() if keyword else None
+
+        if kw and min_severity:
+            return lambda tech: tech.severity == min_severity and (kw in tech.name_lc or kw in tech.desc_lc)
+        if kw:
+            return lambda tech: kw in tech.name_lc or kw in tech.desc_lc
+        if min_severity:
+            return lambda tech: tech.severity == min_severity
+        return None
+
     def search_techniques(self, keyword=None, tactic=None, max_results=50, min_severity=None, 
-                         export_format=None, export_file=None):
-        cache_key = f"{keyword}_{tactic}_{max_results}_{min_severity}"
-        techniques = self.get_from_cache(cache_key)
-        
-        if not techniques:
+                         export_format=None, export_file=None, attack_data=None):
+        if attack_data is None:
             attack_data = self.fetch_attack_data()
-            if not attack_data:
-                return
-                
-            techniques = self.get_techniques(attack_data, tactic)
-            
-            if keyword:
-                techniques = [
-                    tech for tech in techniques 
-                    if keyword.lower() in tech.get('name', '').lower() or 
-                       keyword.lower() in tech.get('description', '').lower()
-                ]
+        if not attack_data:
+            return
             
-            self.save_to_cache(cache_key, techniques)
-        
-        if min_severity:
-            techniques = [
-                tech for tech in techniques 
-                if self.get_severity_level(tech) == min_severity
-            ]
+        techniques = self.get_techniques(attack_data, tactic)
         
-        techniques = techniques[:max_results]
+        # Stop filtering as soon as max_results matches are found
+        matches = self.build_filter(keyword, min_severity)
+        techniques = list(islice(filter(matches, techniques) if matches else techniques, max(max_results, 0)))
         
         if export_format:
             if export_format.lower() == 'csv':
@@ -207,18 +306,21 @@ class AttackHunter:
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = ['Technique_ID', 'Name', 'Tactic', 'Severity', 
                          'Platforms', 'Detection', 'Description']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for tech in techniques:
-                row = self.prepare_technique_data(tech)
-                writer.writerow(row)
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
+            # Positional rows in fieldnames order
+            writer.writerows(
+                (tech.mitre_id, tech.name, tech.tactic, tech.severity,
+                 tech.platforms, tech.detection, tech.description)
+                for tech in techniques
+            )
         
         self.console.print(f"[green]Data exported to {filename}[/green]")
 
     def export_to_json(self, techniques, filename):
         with open(filename, 'w', encoding='utf-8') as jsonfile:
-            json.dump(techniques, jsonfile, indent=2, ensure_ascii=False)
+            json.dump([self.prepare_technique_data(tech) for tech in techniques],
+                      jsonfile, indent=2, ensure_ascii=False)
         self.console.print(f"[green]Data exported to {filename}[/green]")
 
     def display_results(self, techniques):
@@ -226,6 +328,8 @@ class AttackHunter:
             self.console.print("[yellow]No techniques found matching the criteria.[/yellow]")
             return
 
+        from rich.table import Table
+
         table = Table(title="ATT&CK Techniques Found")
         table.add_column("Technique ID", justify="left", style="cyan")
         table.add_column("Name", justify="left", style="green")
@@ -234,23 +338,17 @@ class AttackHunter:
         table.add_column("Platforms", justify="left")
         table.add_column("Description", justify="left", max_width=50)
 
-        for tech in techniques:
-            row = self.prepare_technique_data(tech)
-            severity_style = {
-                "CRÍTICO": "red bold",
-                "ALTO": "red",
-                "MÉDIO": "yellow",
-                "BAIXO": "green"
-            }.get(row['Severity'], "white")
-            
-            table.add_row(
-                row['Technique_ID'],
-                row['Name'],
-                row['Tactic'],
-                f"[{severity_style}]{row['Severity']}[/]",
-                row['Platforms'],
-                row['Description'][:100] + "..." if len(row['Description']) > 100 else row['Description']
-            )
+        rows = [
+            (tech.mitre_id,
+             tech.name,
+             tech.tactic,
+             f"[{SEVERITY_STYLES.get(tech.severity, 'white')}]{tech.severity}[/]",
+             tech.platforms,
+             tech.desc_short)
+            for tech in techniques
+        ]
+        for row in rows:
+            table.add_row(*row)
 
         self.console.print(table)
 
@@ -263,18 +361,27 @@ def main():
                         help='Minimum severity level')
     parser.add_argument('-e', '--export-format', type=str, choices=['csv', 'json'], help='Export format')
     parser.add_argument('-f', '--export-file', type=str, help='Export file name')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Do not print the banner')
 
     args = parser.parse_args()
 
     hunter = AttackHunter()
-    hunter.show_banner()
+    # Download/parse the dataset while the banner renders
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(hunter.fetch_attack_data)
+        hunter.show_banner(quiet=args.quiet)
+        attack_data = future.result()
+    if not attack_data:
+        return
+
     hunter.search_techniques(
         keyword=args.keyword,
         tactic=args.tactic,
         max_results=args.max_results,
         min_severity=args.min_severity,
         export_format=args.export_format,
-        export_file=args.export_file
+        export_file=args.export_file,
+        attack_data=attack_data
     )
 
 if __name__ == "__main__":